@@ -1,63 +1,371 @@
-from git import Repo
+from concurrent.futures import ThreadPoolExecutor
+from git import Git
 from git.exc import GitCommandError
 import os
 import shutil
+import string
+import threading
 from utils.replay.replay import Replay
 
+# Git commands that talk to the remote fail instead of waiting for credentials on
+# a terminal; `Git.execute` merges this over `os.environ`
+_GIT_ENV = {"GIT_TERMINAL_PROMPT": "0"}
+
+
+def _git_dir(repo_path: str) -> str:
+    """
+    Returns the directory holding a repository's refs: `.git`, the path itself
+    when bare, or for a worktree the common directory its `.git` file leads to.
+    """
+    git_dir = os.path.join(repo_path, ".git")
+    if os.path.isdir(git_dir):
+        return git_dir
+    git_dir = _read_gitdir(repo_path)
+    if git_dir is None:
+        return repo_path
+    try:
+        with open(os.path.join(git_dir, "commondir")) as f:
+            return os.path.join(git_dir, f.read().strip())
+    except FileNotFoundError:
+        return git_dir
+
 
 def branch_exists(repo_path, branch_name):
+    """
+    Checks for a local branch by looking for its loose ref file, then streaming
+    `packed-refs`, instead of walking every ref in the repository.
+    """
+    git_dir = _git_dir(repo_path)
+    if os.path.exists(os.path.join(git_dir, "refs", "heads", branch_name)):
+        return True
+    try:
+        with open(os.path.join(git_dir, "packed-refs")) as packed_refs:
+            return any(
+                line.endswith(f" refs/heads/{branch_name}\n") for line in packed_refs
+            )
+    except FileNotFoundError:
+        return False
+
+
+def _default_branch(repo_path: str) -> str | None:
+    """
+    Returns "main" or "master", whichever exists in the repository.
+    """
+    return next(
+        (branch for branch in ("main", "master") if branch_exists(repo_path, branch)),
+        None,
+    )
+
+
+def _remote_default_branch(repo: str) -> str | None:
+    """
+    Returns the default branch the remote's HEAD points at, using a single
+    `git ls-remote --symref` round-trip, or None if it cannot be determined.
+    """
+    try:
+        output = Git().ls_remote("--symref", repo, "HEAD", env=_GIT_ENV)
+    except GitCommandError:
+        return None
+
+    for line in output.splitlines():
+        ref, _, name = line.partition("\t")
+        if name == "HEAD" and ref.startswith("ref: refs/heads/"):
+            return ref.removeprefix("ref: refs/heads/")
+    return None
+
+
+def _clone_options(depth):
+    if depth is None:
+        return []
+    return [f"--depth={depth}", "--single-branch", "--no-tags"]
+
+
+def _fetch_options(bare_path: str, depth: int | None) -> list[str]:
+    """
+    Returns the history options for a fetch: the requested depth, or `--unshallow`
+    when full history is requested for a repository that was cloned shallow.
+    """
+    if depth is not None:
+        return [f"--depth={depth}"]
+    if _is_shallow(bare_path):
+        return ["--unshallow"]
+    return []
+
+
+def _is_shallow(bare_path: str) -> bool:
+    return os.path.exists(os.path.join(bare_path, "shallow"))
+
+
+def _clone_bare(repo: str, bare_path: str, depth: int | None) -> None:
+    """
+    Clones the repository as a bare partial clone (`--filter=blob:none`), so blobs
+    are only downloaded when a worktree checks them out.
+    """
+    Git().clone(
+        "--bare",
+        "--filter=blob:none",
+        *_clone_options(depth),
+        repo,
+        bare_path,
+        env=_GIT_ENV,
+    )
+
+
+_repo_path_locks: dict[str, threading.Lock] = {}
+_repo_path_locks_guard = threading.Lock()
+
+
+def _repo_path_lock(repo_path: str) -> threading.Lock:
+    """
+    Returns the lock serializing clones into the given path.
+    """
+    with _repo_path_locks_guard:
+        return _repo_path_locks.setdefault(repo_path, threading.Lock())
+
+
+def _is_sha1(revision: str) -> bool:
+    return len(revision) == 40 and all(c in string.hexdigits for c in revision)
+
+
+def _has_commit(bare_path: str, sha: str) -> bool:
+    """
+    Checks whether a commit is in the local object database. A partial clone would
+    otherwise fetch a missing commit from the remote on lookup, with its full
+    history and without `_GIT_ENV`; `--missing` turns that lazy fetch off.
+    """
     try:
-        repo = Repo(repo_path)
-        return branch_name in repo.refs
+        output = Git(bare_path).rev_list("-n1", "--no-walk", "--missing=allow-any", sha)
     except GitCommandError:
-        print(
-            f"Error: Unable to check branch '{branch_name}' in repository at '{repo_path}'"
-        )
         return False
+    return output == sha
+
+
+def _resolve_revision(bare_path: str, revision: str, depth: int | None) -> str:
+    """
+    Returns the commit SHA for a revision, only fetching it from the remote when it
+    is not a full SHA already present in the local object database (or when full
+    history is requested for a shallow repository).
+    """
+    if _is_sha1(revision) and not (depth is None and _is_shallow(bare_path)):
+        if _has_commit(bare_path, revision.lower()):
+            return revision.lower()
+
+    bare_git = Git(bare_path)
+    bare_git.fetch(*_fetch_options(bare_path, depth), "origin", revision, env=_GIT_ENV)
+    return bare_git.rev_parse("FETCH_HEAD")
+
+
+def _temp_paths(repo: str) -> tuple[str, str]:
+    """
+    Returns the worktree path and the backing bare repository path for a repo URL.
+    """
+    repo_name = repo.split("/")[-1]
+    if repo_name.strip(".") == "":
+        raise ValueError(f"Cannot derive a repository name from '{repo}'")
+    return f"/tmp/{repo_name}", f"/tmp/_bare/{repo_name}.git"
+
+
+def _read_gitdir(repo_path: str) -> str | None:
+    """
+    Returns the git directory a worktree's `.git` file points at, or None if
+    repo_path has no `.git` file.
+    """
+    try:
+        with open(os.path.join(repo_path, ".git")) as f:
+            gitdir = f.read().strip().removeprefix("gitdir: ")
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        return None
+    return os.path.join(repo_path, gitdir)
+
+
+def _check_origin(bare_path: str, repo: str) -> None:
+    """
+    Raises if the bare repository was cloned from another URL. Paths only use the
+    repository name, so a same-named repository from another owner must not be
+    served from this one's objects.
+    """
+    origin_url = Git(bare_path).config("--get", "remote.origin.url")
+    if origin_url != repo:
+        raise ValueError(f"{bare_path} is already used by {origin_url}, not {repo}")
+
+
+def _is_worktree_of(repo_path: str, bare_path: str) -> bool:
+    """
+    Checks whether repo_path is a worktree registered in the given bare repository.
+    """
+    gitdir = _read_gitdir(repo_path)
+    if gitdir is None or not os.path.isdir(gitdir):
+        return False
+    worktrees_dir = os.path.join(os.path.realpath(bare_path), "worktrees", "")
+    return os.path.realpath(gitdir).startswith(worktrees_dir)
 
 
-def git_temp_clone(repo: str) -> str:
+def _is_stale_checkout(repo_path: str) -> bool:
+    """
+    Checks whether repo_path is a git checkout that can be replaced: a full clone
+    from the old layout, or a worktree whose git directory no longer exists.
+    """
+    if os.path.isdir(os.path.join(repo_path, ".git")):
+        return True
+    gitdir = _read_gitdir(repo_path)
+    return gitdir is not None and not os.path.isdir(gitdir)
+
+
+def git_temp_clone(
+    repo: str,
+    paths: list[str] | None = None,
+    depth: int | None = 1,
+    revision: str | None = None,
+) -> str:
     """
     Clones the given GitHub repository into a temporary directory and returns the path to that directory.
 
+    The objects are stored once in a bare repository under `/tmp/_bare`, and the
+    returned directory is a detached `git worktree` of it, so several checkouts of
+    the same repository share a single object store.
+
     Args:
         repo (str): The URL of the GitHub repository to clone.
+        paths (list[str] | None): If given, only these paths are checked out (sparse
+            checkout) and blobs outside them are never downloaded. Defaults to the
+            full tree.
+        depth (int | None): Number of commits of history to fetch. Defaults to a
+            shallow clone of the latest commit; pass None for full history, whose
+            blobs are still only downloaded on checkout.
+        revision (str | None): Branch, tag or commit SHA to check out. Defaults to
+            the tip of the default branch. A full SHA that is already present
+            locally is checked out without contacting the remote.
 
     Returns:
         str: The path to the temporary directory where the repository was cloned.
     """
-    repo_name = repo.split("/")[-1]
-    repo_path = f"/tmp/{repo_name}"
-
-    # Check if the directory already exists
-    if os.path.exists(repo_path):
-        # If it exists, check if the main branch exists to avoid re-cloning
-        if branch_exists(repo_path, "main"):
-            print(f"Using existing repository at {repo_path}")
-            repo = Repo(repo_path)
-            main_branch = repo.heads["main"]
-            main_branch.checkout()
-            repo.head.reset("origin/main", index=True, working_tree=True)
-            print(f"Reset to main branch and pulled latest changes!")
-        elif branch_exists(repo_path, "master"):
-            print(f"Using existing repository at {repo_path}")
-            repo = Repo(repo_path)
-            master_branch = repo.heads["master"]
-            master_branch.checkout()
-            repo.head.reset("origin/master", index=True, working_tree=True)
-            print(f"Reset to master branch and pulled latest changes!")
+    repo_path, bare_path = _temp_paths(repo)
+    with _repo_path_lock(repo_path):
+        # Never delete anything at repo_path that isn't a git checkout
+        if (
+            os.path.exists(repo_path)
+            and not _is_worktree_of(repo_path, bare_path)
+            and not _is_stale_checkout(repo_path)
+        ):
+            raise FileExistsError(f"{repo_path} exists and is not a checkout of {repo}")
+
+        # Check if the bare repository already exists
+        if os.path.exists(bare_path):
+            _check_origin(bare_path, repo)
+
+            # If it exists, reuse its objects and only fetch the latest changes
+            print(f"Using existing repository at {bare_path}")
+            branch = None
+            if revision is None:
+                # Ask the remote for its default branch; if it doesn't advertise
+                # one, fall back to main/master or the branch the clone's HEAD
+                # points at
+                branch = _remote_default_branch(repo) or _default_branch(bare_path)
+                if branch is None:
+                    branch = Git(bare_path).symbolic_ref("--short", "HEAD")
+
+                Git(bare_path).fetch(
+                    "--prune",
+                    *_fetch_options(bare_path, depth),
+                    "origin",
+                    f"+{branch}:{branch}",
+                    env=_GIT_ENV,
+                )
+                print(f"Fetched latest changes on {branch} branch!")
         else:
-            print(f"Repository at {repo_path} does not have main or master branch")
-            print(f"Cloning repository from {repo}")
-            shutil.rmtree(repo_path)
-            repo = Repo.clone_from(repo, repo_path)
-            print(f"Cloned repository from {repo} to {repo_path}!")
-    else:
-        print(f"Cloning repository from {repo} to {repo_path}")
-        repo = Repo.clone_from(repo, repo_path)
-        print(f"Cloned repository from {repo} to {repo_path}!")
-
-    if Replay.instance_exists() and Replay.get_instance().is_recording():
-        Replay.get_instance().compress_source(repo_path)
+            print(f"Cloning repository from {repo} to {bare_path}")
+            _clone_bare(repo, bare_path, depth)
+            print(f"Cloned repository from {repo} to {bare_path}!")
+            branch = Git(bare_path).symbolic_ref("--short", "HEAD")
+
+        target = branch
+        if revision is not None:
+            target = _resolve_revision(bare_path, revision, depth)
+
+        # Sparse checkout moves `core.bare` into `config.worktree`, which GitPython's
+        # `Repo` does not read, so commands run through `Git` directly.
+        bare_git = Git(bare_path)
+        worktree_git = Git(repo_path)
+
+        # Reuse a live worktree of the bare repository and replace a stale checkout
+        if not _is_worktree_of(repo_path, bare_path):
+            if os.path.exists(repo_path):
+                shutil.rmtree(repo_path)
+            bare_git.worktree("prune")
+            bare_git.worktree("add", "--detach", "--no-checkout", repo_path, target)
+
+        # Checking out files downloads their blobs from the partial clone's remote
+        if paths is not None:
+            # Anchor each pattern at the root so "a" doesn't also match "b/a"
+            worktree_git.sparse_checkout(
+                "set",
+                "--no-cone",
+                *("/" + path.lstrip("/") for path in paths),
+                env=_GIT_ENV,
+            )
+        elif (
+            worktree_git.config("--type=bool", "--default=false", "core.sparseCheckout")
+            == "true"
+        ):
+            worktree_git.sparse_checkout("disable", env=_GIT_ENV)
+        worktree_git.reset("--hard", target, env=_GIT_ENV)
+        print(f"Checked out {target} in worktree at {repo_path}!")
+
+        if Replay.instance_exists() and Replay.get_instance().is_recording():
+            Replay.get_instance().compress_source(repo_path)
 
     return repo_path
+
+
+def git_temp_clone_remove(repo: str) -> None:
+    """
+    Removes the worktree created by `git_temp_clone` for the given repository,
+    keeping the bare repository so later clones can reuse its objects.
+
+    Args:
+        repo (str): The URL of the GitHub repository that was cloned.
+    """
+    repo_path, bare_path = _temp_paths(repo)
+    with _repo_path_lock(repo_path):
+        # Nothing to do unless repo_path is still a worktree of this repository
+        if not _is_worktree_of(repo_path, bare_path):
+            return
+        _check_origin(bare_path, repo)
+        Git(bare_path).worktree("remove", "--force", repo_path)
+        print(f"Removed worktree at {repo_path}")
+
+
+def git_temp_clone_many(
+    repos: list[str], max_workers: int | None = None
+) -> dict[str, str]:
+    """
+    Clones several repositories concurrently with `git_temp_clone`.
+
+    The work is done by `git` subprocesses, so threads overlap the network and pack
+    decoding of different repositories.
+
+    Args:
+        repos (list[str]): The URLs of the GitHub repositories to clone.
+        max_workers (int | None): Number of concurrent clones. Defaults to 3/4 of
+            the available CPUs, with a minimum of 4.
+
+    Returns:
+        dict[str, str]: Mapping from each repository URL to its cloned path.
+    """
+    repos = list(dict.fromkeys(repos))
+    repos_by_path = {}
+    for repo in repos:
+        repo_path, _ = _temp_paths(repo)
+        if repo_path in repos_by_path:
+            raise ValueError(
+                f"{repos_by_path[repo_path]} and {repo} would both be cloned to "
+                f"{repo_path}"
+            )
+        repos_by_path[repo_path] = repo
+
+    if max_workers is None:
+        max_workers = max(4, (os.cpu_count() or 4) * 3 // 4)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {repo: executor.submit(git_temp_clone, repo) for repo in repos}
+        return {repo: future.result() for repo, future in futures.items()}
@@ -17,12 +17,28 @@ Usage:
 Note: Ensure that the SLACK_BOT_TOKEN is properly set in the global configuration.
 """
 
+from contextlib import contextmanager, suppress
 from global_config import global_config
 from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
 from typing import Optional
 
+import hashlib
+import json
+import os
+import re
+import ssl
+import tempfile
+import time
 import warnings
 
+# Channel names are always lowercase, so an uppercase token like "C0123ABCD" is an ID
+CHANNEL_ID_PATTERN = re.compile(r"[CDG][A-Z0-9]{8,}")
+
+# WebClient opens a new connection per API call and, without an explicit context,
+# reloads the CA bundle for each one; a single shared context avoids that
+_ssl_context = ssl.create_default_context()
+
 
 class Slack:
     """
@@ -30,13 +46,26 @@ class Slack:
 
     Attributes:
         client (WebClient): An instance of the Slack WebClient.
+        _channel_cache (dict[str, str]): Channel name to channel ID map, refreshed
+            after `global_config.slack.channel_cache_ttl` seconds and persisted
+            between processes next to `global_config.slack.channel_cache_path`, in
+            a file named after a hash of the bot token.
     """
 
     def __init__(self):
         """
         Initializes the Slack client with the bot token from global configuration.
         """
-        self.client = WebClient(token=global_config.SLACK_BOT_TOKEN)
+        self.client = WebClient(token=global_config.SLACK_BOT_TOKEN, ssl=_ssl_context)
+        self._channel_cache: dict[str, str] = {}
+        self._channel_cache_ts: float = 0.0
+        # Channel IDs belong to a workspace, so each bot token gets its own file
+        cache_root, cache_ext = os.path.splitext(
+            os.path.expanduser(global_config.slack.channel_cache_path)
+        )
+        token_hash = hashlib.sha256(global_config.SLACK_BOT_TOKEN.encode()).hexdigest()
+        self._channel_cache_path = f"{cache_root}.{token_hash[:16]}{cache_ext}"
+        self._load_channel_cache()
 
     def send_message(self, channel_name: str, text: str) -> Optional[str]:
         """
@@ -52,13 +81,12 @@ class Slack:
         Raises:
             SlackApiError: If there's an error sending the message.
         """
-        if not self._check_channel_exists(channel_name):
+        channel_id = self._get_channel_id(channel_name)
+        if channel_id is None:
             raise ValueError(f"Channel '{channel_name}' does not exist")
 
-        if channel_name.startswith("#"):
-            channel_name = channel_name[1:]
-
-        response = self.client.chat_postMessage(channel=channel_name, text=text)
+        with self._forget_channel_if_not_found(channel_id):
+            response = self.client.chat_postMessage(channel=channel_id, text=text)
         return response["ts"]
 
     def send_file(self, channel_name, file_path, initial_comment) -> Optional[str]:
@@ -76,20 +104,17 @@ class Slack:
         Raises:
             SlackApiError: If there's an error uploading the file.
         """
-        if channel_name.startswith("#"):
-            channel_name = channel_name[1:]
-
-        if not self._check_channel_exists(channel_name):
-            raise ValueError(f"Channel '{channel_name}' does not exist")
-
         channel_id = self._get_channel_id(channel_name)
+        if channel_id is None:
+            raise ValueError(f"Channel '{channel_name}' does not exist")
 
         # Upload the file
-        file_upload = self.client.files_upload_v2(
-            channel=channel_id,  # Use channel ID here
-            file=file_path,
-            initial_comment=initial_comment,
-        )
+        with self._forget_channel_if_not_found(channel_id):
+            file_upload = self.client.files_upload_v2(
+                channel=channel_id,  # Use channel ID here
+                file=file_path,
+                initial_comment=initial_comment,
+            )
 
         return file_upload["file"]["timestamp"]
 
@@ -109,17 +134,16 @@ class Slack:
         Raises:
             SlackApiError: If there's an error sending the message.
         """
-        if channel_name.startswith("#"):
-            channel_name = channel_name[1:]
-
-        if not self._check_channel_exists(channel_name):
+        channel_id = self._get_channel_id(channel_name)
+        if channel_id is None:
             raise ValueError(f"Channel '{channel_name}' does not exist")
         if not thread_ts:
             raise ValueError("thread_ts is required")
 
-        response = self.client.chat_postMessage(
-            channel=channel_name, text=text, thread_ts=thread_ts
-        )
+        with self._forget_channel_if_not_found(channel_id):
+            response = self.client.chat_postMessage(
+                channel=channel_id, text=text, thread_ts=thread_ts
+            )
 
         if response["ts"] is None:
             warnings.warning("Failed to send thread reply: response timestamp is None")
@@ -141,46 +165,117 @@ class Slack:
         Raises:
             SlackApiError: If there's an error editing the message.
         """
-        if channel_name.startswith("#"):
-            channel_name = channel_name[1:]
-
-        if not self._check_channel_exists(channel_name):
+        channel_id = self._get_channel_id(channel_name)
+        if channel_id is None:
             raise ValueError(f"Channel '{channel_name}' does not exist")
 
         if not message_ts:
             raise ValueError("message_ts is required")
 
-        channel_id = self._get_channel_id(channel_name)
-        if not channel_id:
-            print(f"Error: Channel '{channel_name}' not found.")
-            return False
-
-        response = self.client.chat_update(
-            channel=channel_id, ts=message_ts, text=new_text
-        )
+        with self._forget_channel_if_not_found(channel_id):
+            response = self.client.chat_update(
+                channel=channel_id, ts=message_ts, text=new_text
+            )
         return response["ok"]
 
-    def _get_channel_id(self, channel_name: str) -> Optional[str]:
+    @staticmethod
+    def _normalize_channel_name(channel_name: str) -> str:
         """
-        Checks if a channel exists by name.
+        Strips the leading "#" so "#name" and "name" share a cache entry.
         """
-        if channel_name.startswith("#"):
-            channel_name = channel_name[1:]
+        return channel_name[1:] if channel_name.startswith("#") else channel_name
 
-        channels = self.client.conversations_list()
-        channel_id = None
-        for channel in channels["channels"]:
-            if channel["name"] == channel_name:
-                channel_id = channel["id"]
+    def _get_channel_id(self, channel_name: str) -> Optional[str]:
+        """
+        Returns the ID of a channel by name, or None if it does not exist.
+
+        IDs are returned as is, and names in `global_config.slack.channel_id_map`
+        are resolved without calling the API. Otherwise the full name to ID map is
+        fetched in one paginated pass and cached for
+        `global_config.slack.channel_cache_ttl` seconds.
+        """
+        channel_name = self._normalize_channel_name(channel_name)
+
+        if CHANNEL_ID_PATTERN.fullmatch(channel_name):
+            return channel_name
+
+        channel_id = getattr(global_config.slack.channel_id_map, channel_name, None)
+        if channel_id is not None:
+            return channel_id
+
+        cache_age = time.monotonic() - self._channel_cache_ts
+        if (
+            cache_age < global_config.slack.channel_cache_ttl
+            and channel_name in self._channel_cache
+        ):
+            return self._channel_cache[channel_name]
+
+        channel_cache = {}
+        cursor = None
+        while True:
+            response = self.client.conversations_list(limit=1000, cursor=cursor)
+            for channel in response["channels"]:
+                channel_cache[channel["name"]] = channel["id"]
+            cursor = response.get("response_metadata", {}).get("next_cursor")
+            if not cursor:
                 break
 
-        return channel_id
+        self._channel_cache = channel_cache
+        self._channel_cache_ts = time.monotonic()
+        self._save_channel_cache()
+        return self._channel_cache.get(channel_name)
 
-    def _check_channel_exists(self, channel_name: str) -> bool:
+    def _load_channel_cache(self) -> None:
+        """
+        Loads the channel map saved by a previous process, if there is one. The map
+        is as old as the file, so a stale one is still refreshed on the next miss.
+        """
+        try:
+            with open(self._channel_cache_path) as f:
+                self._channel_cache = json.load(f)
+                file_age = time.time() - os.fstat(f.fileno()).st_mtime
+        except (OSError, ValueError):
+            return
+        self._channel_cache_ts = time.monotonic() - max(file_age, 0.0)
+
+    def _save_channel_cache(self) -> None:
+        """
+        Writes the channel map to disk, replacing the file atomically so
+        concurrent processes never read a partial map. The cache is only an
+        optimization, so a failed write is ignored.
+        """
+        cache_dir = os.path.dirname(self._channel_cache_path)
+        tmp_path = None
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w", dir=cache_dir, suffix=".tmp", delete=False
+            ) as f:
+                tmp_path = f.name
+                json.dump(self._channel_cache, f)
+            os.replace(tmp_path, self._channel_cache_path)
+        except OSError:
+            if tmp_path is not None:
+                with suppress(OSError):
+                    os.remove(tmp_path)
+
+    @contextmanager
+    def _forget_channel_if_not_found(self, channel_id: str):
         """
-        Checks if a channel exists by name.
+        Drops a cached channel ID that Slack reports as `channel_not_found`, so the
+        next lookup fetches the channel list again.
         """
-        return self._get_channel_id(channel_name) is not None
+        try:
+            yield
+        except SlackApiError as e:
+            if e.response.get("error") == "channel_not_found":
+                self._channel_cache = {
+                    name: cached_id
+                    for name, cached_id in self._channel_cache.items()
+                    if cached_id != channel_id
+                }
+                self._save_channel_cache()
+            raise
 
 
 if __name__ == "__main__":
@@ -1,64 +1,173 @@
 import pytest
 import os
+import queue
+import threading
 import time
-from filelock import FileLock
 from integrations.slack.slack import Slack
 
 
 thread_head = "Test Header"
 slack = Slack()
+# Resolved once so later calls skip the channel lookup
+eval_channel = slack._get_channel_id("eval-results") or "eval-results"
+totals_log = "/tmp/parallel_totals.log"
+thread_ts_lock = "/tmp/parallel_thread_ts.lock"
+thread_ts_timeout = 30
+
+# Thread replies are posted by a background thread in each worker so tests don't
+# block on Slack round-trips; a None item stops the thread. Replies to the same
+# thread are joined into one message, sent once the oldest has waited
+# reply_flush_interval seconds or the batch would exceed reply_max_chars.
+thread_replies = queue.Queue()
+reply_flush_interval = 2.0
+reply_max_chars = 3500
+
+
+def _send_batched_replies(channel_name, thread_ts, texts):
+    try:
+        slack.send_thread_reply(channel_name, thread_ts, "\n".join(texts))
+    except Exception as e:
+        print(f"Error: Failed to send thread reply: {e}")
+
+
+def _drain_thread_replies():
+    batches = {}  # (channel_name, thread_ts) -> (first queued time, texts, size)
+    stopping = False
+    while not stopping:
+        timeout = None
+        if batches:
+            oldest = min(queued_at for queued_at, _, _ in batches.values())
+            timeout = max(0.0, oldest + reply_flush_interval - time.monotonic())
+        try:
+            reply = thread_replies.get(timeout=timeout)
+        except queue.Empty:
+            reply = ()
+
+        if reply is None:
+            stopping = True
+        elif reply:
+            channel_name, thread_ts, text = reply
+            text = text.rstrip("\n")
+            key = (channel_name, thread_ts)
+            if key in batches and batches[key][2] + len(text) + 1 > reply_max_chars:
+                _send_batched_replies(*key, batches.pop(key)[1])
+            queued_at, texts, size = batches.get(key, (time.monotonic(), [], -1))
+            batches[key] = (queued_at, texts + [text], size + len(text) + 1)
+
+        now = time.monotonic()
+        for key, (queued_at, texts, _) in list(batches.items()):
+            if stopping or now - queued_at >= reply_flush_interval:
+                _send_batched_replies(*key, texts)
+                del batches[key]
+
+
+thread_replies_drainer = threading.Thread(target=_drain_thread_replies, daemon=True)
 
 
 def pytest_configure(config):
-    config.cache.set("parallel_add_total_1", 0)
-    config.cache.set("parallel_add_total_2", 0)
-    # Clear the thread_ts at the start of each test run
-    config.cache.set("thread_ts", None)
+    thread_replies_drainer.start()
+    if not hasattr(config, "workerinput"):  # Only run on the main process
+        for path in (totals_log, thread_ts_lock):
+            if os.path.exists(path):
+                os.remove(path)
+        # Clear the thread_ts at the start of each test run
+        config.cache.set("thread_ts", None)
+
+
+def _create_thread(config):
+    thread_ts = slack.send_message(eval_channel, thread_head + "🟡 Status: Running\n")
+    config.cache.set("thread_ts", thread_ts)
+    return thread_ts
+
+
+def _claim_thread_creation():
+    # Creating the lock file with O_EXCL succeeds in exactly one process
+    try:
+        os.close(os.open(thread_ts_lock, os.O_WRONLY | os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        return False
+    return True
+
+
+def pytest_collection_finish(session):
+    # Runs after deselection in whichever processes collect: the main process, or
+    # every xdist worker but not the controller. The thread is only posted when a
+    # selected test uses it, and by the single process that claims the lock.
+    if session.config.option.collectonly:
+        return
+    if any("thread_ts" in getattr(item, "fixturenames", ()) for item in session.items):
+        if _claim_thread_creation():
+            _create_thread(session.config)
 
 
 @pytest.fixture(scope="session")
 def thread_ts(request):
-    lock_file = "slack_thread.lock"
-    with FileLock(lock_file):
+    # Without xdist, create the thread here if collection didn't, e.g. for a
+    # conftest loaded after collection finished
+    if not hasattr(request.config, "workerinput"):
         thread_ts = request.config.cache.get("thread_ts", None)
-        if thread_ts is None:
-            # Create a new thread only if it doesn't exist
-            thread_ts = slack.send_message(
-                "eval-results", thread_head + "🟡 Status: Running\n"
-            )
-            request.config.cache.set("thread_ts", thread_ts)
-        return thread_ts
+        return thread_ts or _create_thread(request.config)
+
+    # Wait for the worker that claimed the lock to publish the thread, backing off
+    # between reads
+    deadline = time.monotonic() + thread_ts_timeout
+    delay = 0.05
+    while True:
+        thread_ts = request.config.cache.get("thread_ts", None)
+        if thread_ts is not None:
+            return thread_ts
+        if time.monotonic() > deadline:
+            raise RuntimeError("Timed out waiting for the Slack thread to be created")
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
+
+
+@pytest.fixture(scope="session")
+def enqueue_thread_reply():
+    def enqueue(channel_name, thread_ts, text):
+        thread_replies.put((channel_name, thread_ts, text))
+
+    return enqueue
 
 
 @pytest.fixture(scope="function")
-def parallel_add_totals(request):
+def parallel_add_totals():
     def increment(amount1, amount2):
-        with FileLock("parallel_add_totals.lock"):
-            current_total1 = request.config.cache.get("parallel_add_total_1", 0)
-            current_total2 = request.config.cache.get("parallel_add_total_2", 0)
-            new_total1 = current_total1 + amount1
-            new_total2 = current_total2 + amount2
-            request.config.cache.set("parallel_add_total_1", new_total1)
-            request.config.cache.set("parallel_add_total_2", new_total2)
+        # A single O_APPEND write smaller than PIPE_BUF is atomic, so workers can
+        # append concurrently without a lock; the totals are summed at session end
+        fd = os.open(totals_log, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, f"{amount1},{amount2}\n".encode())
+        finally:
+            os.close(fd)
 
     return increment
 
 
+def read_parallel_add_totals():
+    total1, total2 = 0, 0
+    if os.path.exists(totals_log):
+        with open(totals_log) as f:
+            for line in f:
+                amount1, amount2 = line.split(",")
+                total1 += int(amount1)
+                total2 += int(amount2)
+    return total1, total2
+
+
 def pytest_sessionfinish(session, exitstatus):
+    # Flush the replies queued by this process before reporting
+    thread_replies.put(None)
+    thread_replies_drainer.join(timeout=30)
+
     if not hasattr(session.config, "workerinput"):  # Only run on the main process
         thread_ts = session.config.cache.get("thread_ts", None)
-        total1 = session.config.cache.get("parallel_add_total_1", 0)
-        total2 = session.config.cache.get("parallel_add_total_2", 0)
+        total1, total2 = read_parallel_add_totals()
 
         if thread_ts:
             slack.edit_message(
-                "eval-results",
+                eval_channel,
                 thread_ts,
                 thread_head
                 + f"🟢 Status: Finished Running\nTotal 1: {total1}\nTotal 2: {total2}\n",
             )
-
-    # Clean up lock files
-    for lock_file in ["slack_thread.lock", "parallel_add_totals.lock"]:
-        if os.path.exists(lock_file):
-            os.remove(lock_file)
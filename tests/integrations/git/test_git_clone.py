@@ -0,0 +1,234 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+import uuid
+from unittest import mock
+
+from integrations.git import git_clone
+from integrations.git.git_clone import (
+    branch_exists,
+    git_temp_clone,
+    git_temp_clone_many,
+    git_temp_clone_remove,
+)
+from tests.test_class import TestCaseClass, ci_test
+
+
+def git(cwd, *args):
+    return subprocess.run(
+        ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+class TestGitClone(TestCaseClass):
+    def setUp(self) -> None:
+        super().setUp()
+        # Local upstream repositories served over file://, so the tests run offline
+        self.upstream_root = tempfile.mkdtemp()
+        self.created_names = []
+
+    def tearDown(self) -> None:
+        for name in self.created_names:
+            shutil.rmtree(f"/tmp/{name}", ignore_errors=True)
+            shutil.rmtree(f"/tmp/_bare/{name}.git", ignore_errors=True)
+        shutil.rmtree(self.upstream_root, ignore_errors=True)
+        super().tearDown()
+
+    def make_upstream(self, branch="main", owner="owner"):
+        """Creates an upstream repository with a unique name and returns its URL"""
+        name = f"test-git-clone-{uuid.uuid4().hex[:12]}"
+        self.created_names.append(name)
+        path = os.path.join(self.upstream_root, owner, name)
+        os.makedirs(path)
+        git(path, "init", "-q", "-b", branch)
+        # Partial clones and fetches by SHA need these on the serving side
+        git(path, "config", "uploadpack.allowFilter", "true")
+        git(path, "config", "uploadpack.allowAnySHA1InWant", "true")
+        self.write_files(path, {"a/x": "1", "b/y": "1", "b/a/z": "1"})
+        self.commit(path, "initial")
+        return f"file://{path}", path, name
+
+    def write_files(self, path, files):
+        for file_name, content in files.items():
+            file_path = os.path.join(path, file_name)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "w") as f:
+                f.write(content)
+
+    def commit(self, path, message):
+        git(path, "add", "-A")
+        git(path, "commit", "-q", "-m", message)
+        return git(path, "rev-parse", "HEAD")
+
+    def read(self, repo_path, file_name):
+        with open(os.path.join(repo_path, file_name)) as f:
+            return f.read()
+
+    @ci_test
+    def test_fresh_clone(self):
+        """Test that a fresh clone checks out the default branch"""
+        url, upstream, name = self.make_upstream()
+        repo_path = git_temp_clone(url)
+
+        self.assertEqual(repo_path, f"/tmp/{name}")
+        self.assertEqual(self.read(repo_path, "a/x"), "1")
+        self.assertEqual(
+            git(repo_path, "rev-parse", "HEAD"), git(upstream, "rev-parse", "HEAD")
+        )
+
+    @ci_test
+    def test_update_after_upstream_commit(self):
+        """Test that cloning again fetches a commit made upstream since the last clone"""
+        url, upstream, _ = self.make_upstream()
+        repo_path = git_temp_clone(url)
+
+        self.write_files(upstream, {"a/x": "2"})
+        sha = self.commit(upstream, "update")
+        git_temp_clone(url)
+
+        self.assertEqual(self.read(repo_path, "a/x"), "2")
+        self.assertEqual(git(repo_path, "rev-parse", "HEAD"), sha)
+
+    @ci_test
+    def test_sparse_then_full(self):
+        """Test that a sparse checkout is anchored at the root and can be widened"""
+        url, _, _ = self.make_upstream()
+        repo_path = git_temp_clone(url, paths=["a"])
+
+        self.assertTrue(os.path.exists(os.path.join(repo_path, "a/x")))
+        # "a" must not also match the nested "b/a"
+        self.assertFalse(os.path.exists(os.path.join(repo_path, "b")))
+
+        git_temp_clone(url)
+        self.assertTrue(os.path.exists(os.path.join(repo_path, "b/y")))
+        self.assertTrue(os.path.exists(os.path.join(repo_path, "b/a/z")))
+
+    @ci_test
+    def test_sha_reuse(self):
+        """Test that a SHA already in the local clone is checked out without fetching"""
+        url, upstream, _ = self.make_upstream()
+        sha = git(upstream, "rev-parse", "HEAD")
+        repo_path = git_temp_clone(url)
+
+        with mock.patch.object(
+            git_clone, "_fetch_options", side_effect=AssertionError("fetched")
+        ):
+            git_temp_clone(url, revision=sha)
+        self.assertEqual(git(repo_path, "rev-parse", "HEAD"), sha)
+
+    @ci_test
+    def test_sha_fetch(self):
+        """Test that a SHA missing from the local clone is fetched at the requested depth"""
+        url, upstream, _ = self.make_upstream()
+        for i in range(3):
+            self.write_files(upstream, {"a/x": str(i + 2)})
+            self.commit(upstream, "update")
+        old_sha = git(upstream, "rev-parse", "HEAD~2")
+        repo_path = git_temp_clone(url)
+
+        git_temp_clone(url, revision=old_sha)
+        self.assertEqual(git(repo_path, "rev-parse", "HEAD"), old_sha)
+        self.assertEqual(self.read(repo_path, "a/x"), "2")
+        self.assertEqual(git(repo_path, "rev-list", "--count", "HEAD"), "1")
+
+    @ci_test
+    def test_trunk_default_branch(self):
+        """Test that a remote whose default branch is neither main nor master updates"""
+        url, upstream, _ = self.make_upstream(branch="trunk")
+        repo_path = git_temp_clone(url)
+
+        self.write_files(upstream, {"a/x": "2"})
+        self.commit(upstream, "update")
+        git_temp_clone(url)
+        self.assertEqual(self.read(repo_path, "a/x"), "2")
+
+    @ci_test
+    def test_remove_then_readd(self):
+        """Test that a clone can be removed twice and added again"""
+        url, _, name = self.make_upstream()
+        repo_path = git_temp_clone(url)
+
+        git_temp_clone_remove(url)
+        self.assertFalse(os.path.exists(repo_path))
+        self.assertTrue(os.path.exists(f"/tmp/_bare/{name}.git"))
+
+        # Removing again is a no-op
+        git_temp_clone_remove(url)
+
+        git_temp_clone(url)
+        self.assertEqual(self.read(repo_path, "a/x"), "1")
+
+    @ci_test
+    def test_full_history_unshallows(self):
+        """Test that depth=None fetches the full history of a shallow clone"""
+        url, upstream, _ = self.make_upstream()
+        self.write_files(upstream, {"a/x": "2"})
+        self.commit(upstream, "update")
+        repo_path = git_temp_clone(url)
+        self.assertEqual(git(repo_path, "rev-list", "--count", "HEAD"), "1")
+
+        git_temp_clone(url, depth=None)
+        self.assertEqual(git(repo_path, "rev-list", "--count", "HEAD"), "2")
+
+    @ci_test
+    def test_branch_exists_on_worktree(self):
+        """Test that branches are found from the worktree path, not only the bare clone"""
+        url, _, _ = self.make_upstream()
+        repo_path = git_temp_clone(url)
+
+        self.assertTrue(branch_exists(repo_path, "main"))
+        self.assertFalse(branch_exists(repo_path, "does-not-exist"))
+
+    @ci_test
+    def test_unrelated_directory_is_kept(self):
+        """Test that a directory that is not a git checkout is never deleted"""
+        url, _, name = self.make_upstream()
+        os.makedirs(f"/tmp/{name}")
+        self.write_files(f"/tmp/{name}", {"keep": "1"})
+
+        with self.assertRaises(FileExistsError):
+            git_temp_clone(url)
+        self.assertEqual(self.read(f"/tmp/{name}", "keep"), "1")
+
+    @ci_test
+    def test_invalid_repository_name(self):
+        """Test that a URL without a repository name is rejected"""
+        with self.assertRaises(ValueError):
+            git_temp_clone("file:///tmp/")
+        with self.assertRaises(ValueError):
+            git_temp_clone("file:///tmp/..")
+
+    @ci_test
+    def test_name_collision(self):
+        """Test that same-named repositories from different owners are rejected"""
+        url, upstream, name = self.make_upstream()
+        other_path = os.path.join(self.upstream_root, "other-owner", name)
+        shutil.copytree(upstream, other_path)
+        other_url = f"file://{other_path}"
+
+        with self.assertRaises(ValueError):
+            git_temp_clone_many([url, other_url])
+
+        git_temp_clone(url)
+        with self.assertRaises(ValueError):
+            git_temp_clone(other_url)
+
+    @ci_test
+    def test_clone_many(self):
+        """Test that several repositories are cloned in parallel"""
+        urls = {}
+        for _ in range(3):
+            url, _, name = self.make_upstream()
+            urls[url] = f"/tmp/{name}"
+
+        self.assertEqual(git_temp_clone_many(list(urls)), urls)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -50,6 +50,42 @@ class TestSlack(TestCaseClass):
 
         self.assertIsNotNone(thread_ts, "File should be sent successfully")
 
+    @ci_test
+    def test_get_channel_id_cached(self):
+        """Test that channel IDs are served from the cache after the first lookup"""
+        conversations_list = self.slack.client.conversations_list
+        list_passes = []
+
+        def counting_conversations_list(**kwargs):
+            # A pass over the channel list starts with an empty cursor
+            if not kwargs.get("cursor"):
+                list_passes.append(kwargs)
+            return conversations_list(**kwargs)
+
+        self.slack.client.conversations_list = counting_conversations_list
+        self.slack._channel_cache.clear()
+
+        channel_id = self.slack._get_channel_id(self.channel_name)
+        self.assertIsNotNone(channel_id, "Channel should exist")
+        self.assertEqual(self.slack._channel_cache[self.channel_name], channel_id)
+
+        self.assertEqual(
+            self.slack._get_channel_id(f"#{self.channel_name}"), channel_id
+        )
+        self.assertEqual(self.slack._get_channel_id(self.channel_name), channel_id)
+        self.assertEqual(len(list_passes), 1, "Channel list should be fetched once")
+
+    @ci_test
+    def test_send_message_by_channel_id(self):
+        """Test that a channel ID can be used wherever a channel name is accepted"""
+        channel_id = self.slack._get_channel_id(self.channel_name)
+        self.assertEqual(self.slack._get_channel_id(channel_id), channel_id)
+
+        thread_ts = self.slack.send_message(
+            channel_id, f"Unit Test at `{__file__}`: Sent by channel ID"
+        )
+        self.assertIsNotNone(thread_ts, "Message should be sent successfully")
+
 
 if __name__ == "__main__":
     unittest.main()